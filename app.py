@@ -1,17 +1,20 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 import datetime
 import re
 import os
+import hashlib
+import hmac
 import pytz
-import time
-from collections import defaultdict
-from sqlalchemy import text
-import pprint
-import matplotlib
+from sqlalchemy import bindparam, text
 
 SEASON_YEAR = 2025
+SEASON_START_ORDINAL = datetime.date(SEASON_YEAR, 8, 27).toordinal()
 
 # --- Page and App Configuration (THEMED) ---
 
@@ -29,35 +32,70 @@ USERS = {
     "Rian": "pass123", "Tucker": "pass123", "Aaron": "pass123",
     "Brayson": "pass123"
 }
+# Digests are computed once at import so logins compare hashes in constant time
+USER_PASSWORD_HASHES = {user: hashlib.sha256(password.encode()).digest() for user, password in USERS.items()}
+
+DRAFT_SUMMARY_FILE = "draft_summary.txt"
+# Matches either a "--- Name's Picks ---" header or a numbered "1. Team" pick line
+DRAFT_LINE_RE = re.compile(r"^(?:---\s*(?P<user>.+?)(?:'s Picks)?\s*---|\d+[.\s]*(?P<team>.+?))\s*$")
+PREFERRED_LINE_PROVIDERS = ('Bovada', 'DraftKings', 'consensus')
 
 # --- Helper Functions (with Caching) ---
 
+def get_file_mtime(file_path):
+    """Returns a file's modification time (or None if missing) for use as a cache key."""
+    return os.path.getmtime(file_path) if file_path and os.path.exists(file_path) else None
+
 @st.cache_data
-def parse_draft_summary(file_path="draft_summary.txt"):
-    """Parses the draft summary text file into a dictionary (for sidebar display)."""
+def parse_draft_summary(file_path=DRAFT_SUMMARY_FILE, file_mtime=None):
+    """Parses the draft summary text file into a dictionary (for sidebar display).
+
+    file_mtime is only used as part of the cache key so edits to the file are picked up.
+    """
     if not os.path.exists(file_path):
         return {}
+    with open(file_path, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
     all_picks = {}
     current_user = None
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith("---") and line.endswith("---"):
-                user_name = line.replace("---", "").replace("'s Picks", "").strip()
-                current_user = user_name
-                all_picks[current_user] = []
-            elif current_user and line and (line and line[0].isdigit()):
-                team_name = ''.join([i for i in line if not i.isdigit()]).lstrip('. ')
-                all_picks[current_user].append(team_name)
+    for line in lines:
+        match = DRAFT_LINE_RE.match(line.strip())
+        if not match:
+            continue
+        if match['user']:
+            current_user = match['user']
+            all_picks[current_user] = []
+        elif current_user:
+            all_picks[current_user].append(match['team'])
     return all_picks
 
+def find_schedule_file(year, week):
+    """Returns the schedule CSV path for a week, or None if it doesn't exist."""
+    file_path = f"{year}_week_{week}.csv"
+    return file_path if os.path.exists(file_path) else None
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_schedule(file_path, file_mtime=None):
+    """Loads a week's schedule file into a team-indexed frame of Location and Opponent.
+
+    file_mtime is only used as part of the cache key so edits to the file are picked up.
+    """
+    if file_path is None:
+        # Don't crash if the schedule file is missing; API data might still load
+        return pd.DataFrame(columns=['Location', 'Opponent'], index=pd.Index([], dtype=object))
+    schedule_df = pd.read_csv(file_path, usecols=['homeTeam', 'awayTeam'], dtype=str)
+    home, away = schedule_df['homeTeam'].to_numpy(), schedule_df['awayTeam'].to_numpy()
+    matchups_df = pd.concat([
+        pd.DataFrame({'Location': 'Home', 'Opponent': away}, index=home),
+        pd.DataFrame({'Location': 'Away', 'Opponent': home}, index=away),
+    ])
+    return matchups_df[~matchups_df.index.duplicated(keep='last')]
+
 def get_current_week():
     """Calculates the current week of the season."""
-    season_start_date = datetime.date(2025, 8, 27)
-    today = datetime.date.today()
-    if today < season_start_date:
+    days_since_start = datetime.date.today().toordinal() - SEASON_START_ORDINAL
+    if days_since_start < 0:
         return 1
-    days_since_start = (today - season_start_date).days
     current_week = (days_since_start // 7) + 1
     return min(current_week, 15)
 
@@ -109,8 +147,29 @@ def calculate_parlay_odds(picked_teams, moneyline_data):
         final_american_odd = -100 / (total_decimal_odd - 1)
         return f"{final_american_odd:.0f}"
 
+def format_spread(spread):
+    """Formats a point spread for display (e.g. '+3.5', '-7.0', 'N/A')."""
+    return f"+{spread}" if spread and spread > 0 else str(spread) if spread is not None else "N/A"
+
+def format_game_result(game_result):
+    """Formats a completed game's result (e.g. 'W (31-17)'), or 'Pending' if not played."""
+    if not game_result:
+        return "Pending"
+    result_char = "W" if game_result['win'] else "L"
+    return f"{result_char} ({game_result['score']}-{game_result['opponent_score']})"
+
 # --- API & Data Fetching Functions ---
 
+@st.cache_resource
+def get_api_session(api_key):
+    """Builds a pooled, authorized HTTP session for the collegefootballdata API, reused across reruns."""
+    session = requests.Session()
+    session.headers.update({'accept': 'application/json', 'accept-encoding': 'gzip', 'Authorization': f"Bearer {api_key}"})
+    # Only short backoffs on gateway errors; a 429 (or a server Retry-After) would otherwise stall the rerun
+    retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504], allowed_methods=["GET"], raise_on_status=False, respect_retry_after_header=False)
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries))
+    return session
+
 def fetch_api_data(endpoint, params):
     """Generic function to fetch data from the collegefootballdata API."""
     try:
@@ -121,37 +180,43 @@ def fetch_api_data(endpoint, params):
     except AttributeError:
         st.error("API key not found. Please add it to your Streamlit app settings.")
         return None, "API key not configured."
-    auth_header_value = f"Bearer {api_key}"
-    headers = {'accept': 'application/json', 'Authorization': auth_header_value}
     try:
-        response = requests.get(f"https://api.collegefootballdata.com/{endpoint}", headers=headers, params=params)
-        response.raise_for_status()
-        return response.json(), None
-    except requests.exceptions.HTTPError as e:
-        return None, f"API request failed: {e.response.status_code} - {e.response.text}."
+        response = get_api_session(api_key).get(f"https://api.collegefootballdata.com/{endpoint}", params=params, timeout=10)
     except requests.exceptions.RequestException as e:
         return None, f"Connection Error: {e}"
+    if not response.ok:
+        return None, f"API request failed: {response.status_code} - {response.text}."
+    if not response.content:
+        return [], None
+    try:
+        return orjson.loads(response.content), None
+    except orjson.JSONDecodeError as e:
+        return None, f"Invalid API response: {e}"
 
-@st.cache_data(ttl=300)
-def fetch_game_results(year, week):
-    """Fetches game results for a given week and returns a set of winning teams."""
+@st.cache_data(ttl=300, max_entries=4, show_spinner=False)
+def fetch_week_games(year, week):
+    """Fetches the raw games list for a given week, shared by the results helpers below."""
     games_data, error = fetch_api_data("games", {'year': year, 'week': week, 'seasonType': 'regular'})
     if error or not games_data:
-        return set()
-    winning_teams = set()
-    for game in games_data:
-        if game.get('completed') and game.get('homePoints') is not None and game.get('awayPoints') is not None:
-            if game['homePoints'] > game['awayPoints']:
-                winning_teams.add(game['homeTeam'])
-            elif game['awayPoints'] > game['homePoints']:
-                winning_teams.add(game['awayTeam'])
-    return winning_teams
+        return []
+    return games_data
 
-@st.cache_data(ttl=300)
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_game_results(year, week):
+    """Fetches game results for a given week and returns a frozenset of winning teams."""
+    games_data = fetch_week_games(year, week)
+    return frozenset(
+        game['homeTeam'] if game['homePoints'] > game['awayPoints'] else game['awayTeam']
+        for game in games_data
+        if game.get('completed') and game.get('homePoints') is not None and game.get('awayPoints') is not None
+        and game['homePoints'] != game['awayPoints']
+    )
+
+@st.cache_data(ttl=300, show_spinner=False)
 def fetch_completed_game_scores(year, week):
     """Fetches completed games and returns a dictionary with detailed scores."""
-    games_data, error = fetch_api_data("games", {'year': year, 'week': week, 'seasonType': 'regular'})
-    if error or not games_data:
+    games_data = fetch_week_games(year, week)
+    if not games_data:
         return {}
     scores = {}
     for game in games_data:
@@ -162,88 +227,188 @@ def fetch_completed_game_scores(year, week):
             scores[away_team] = {'score': away_pts, 'opponent_score': home_pts, 'win': away_pts > home_pts}
     return scores
 
-@st.cache_data(ttl=3600)
+@st.cache_data(ttl=3600, max_entries=4, show_spinner=False)
 def fetch_betting_lines(year, week):
     """Fetches betting lines for a given week from the API."""
     lines_data, error = fetch_api_data("lines", {'year': year, 'week': week, 'seasonType': 'regular'})
     if error or not lines_data: return {}
 
-    betting_data = defaultdict(dict)
+    betting_data = {}
     for game in lines_data:
-        if game.get('lines'):
-            preferred_providers = ['Bovada', 'DraftKings', 'consensus']
-            line_to_use = None
-            for provider in preferred_providers:
-                found_line = next((line for line in game['lines'] if line.get('provider') == provider), None)
-                if found_line:
-                    line_to_use = found_line
-                    break
-            if not line_to_use and game['lines']:
-                line_to_use = game['lines'][0]
-            
-            if line_to_use:
-                if line_to_use.get('spread'):
-                    try:
-                        spread = float(line_to_use['spread'])
-                        betting_data[game['homeTeam']]['spread'] = spread
-                        betting_data[game['awayTeam']]['spread'] = -spread
-                    except (ValueError, TypeError):
-                        pass
+        game_lines = game.get('lines')
+        if not game_lines:
+            continue
+        # Index once by provider (first line wins) instead of rescanning per provider
+        lines_by_provider = {line.get('provider'): line for line in reversed(game_lines)}
+        line_to_use = next((lines_by_provider[p] for p in PREFERRED_LINE_PROVIDERS if p in lines_by_provider), game_lines[0])
+
+        home_data, away_data = {}, {}
+        if line_to_use.get('spread'):
+            try:
+                spread = float(line_to_use['spread'])
+                home_data['spread'], away_data['spread'] = spread, -spread
+            except (ValueError, TypeError):
+                pass
+
+        if line_to_use.get('homeMoneyline') is not None and line_to_use.get('awayMoneyline') is not None:
+            home_data['moneyline'], away_data['moneyline'] = line_to_use['homeMoneyline'], line_to_use['awayMoneyline']
+
+        if home_data:
+            betting_data.setdefault(game['homeTeam'], {}).update(home_data)
+            betting_data.setdefault(game['awayTeam'], {}).update(away_data)
+    return betting_data
 
-                if line_to_use.get('homeMoneyline') is not None and line_to_use.get('awayMoneyline') is not None:
-                    betting_data[game['homeTeam']]['moneyline'] = line_to_use['homeMoneyline']
-                    betting_data[game['awayTeam']]['moneyline'] = line_to_use['awayMoneyline']
-    return dict(betting_data)
+# --- Database Setup and Read Helpers (with Caching) ---
+
+# Writes a user's weekly wins in place, relying on the unique (user, week) index from init_db
+SCOREBOARD_UPSERT_SQL = text(
+    'INSERT INTO scoreboard ("user", week, wins) VALUES (:user, :week, :wins) '
+    'ON CONFLICT ("user", week) DO UPDATE SET wins = excluded.wins;'
+)
+# Counts each user's picks for a week that are in the :winners list
+WEEK_SCORES_SQL = text(
+    'SELECT "user", SUM(CASE WHEN team IN :winners THEN 1 ELSE 0 END) AS wins '
+    'FROM picks WHERE week = :week GROUP BY "user";'
+).bindparams(bindparam("winners", expanding=True))
+
+@st.cache_resource
+def get_db():
+    """Returns the app's SQL connection, created once per process and shared by every rerun."""
+    return st.connection("db", type="sql", pool_pre_ping=True)
+
+@st.cache_resource
+def init_db():
+    """Creates the app's tables and indexes if they don't exist (runs once per process)."""
+    conn = get_db()
+    with conn.session as s, s.begin():
+        s.execute(text('CREATE TABLE IF NOT EXISTS picks ("user" TEXT, week INTEGER, team TEXT);'))
+        s.execute(text('CREATE TABLE IF NOT EXISTS scoreboard ("user" TEXT, week INTEGER, wins INTEGER);'))
+        s.execute(text('CREATE TABLE IF NOT EXISTS user_status ("user" TEXT PRIMARY KEY, emoji TEXT);'))
+        # Serves both the per-week reads and the per-user, per-week reads of picks
+        s.execute(text('CREATE INDEX IF NOT EXISTS picks_week_user_idx ON picks (week, "user");'))
+        # A team can be picked once per user per week; collapse any repeated rows before indexing
+        duplicate_picks = [
+            dict(user=row.user, week=row.week, team=row.team)
+            for row in s.execute(text('SELECT "user", week, team FROM picks GROUP BY "user", week, team HAVING COUNT(*) > 1;'))
+        ]
+        if duplicate_picks:
+            s.execute(text('DELETE FROM picks WHERE "user" = :user AND week = :week AND team = :team;'), duplicate_picks)
+            s.execute(text('INSERT INTO picks ("user", week, team) VALUES (:user, :week, :team);'), duplicate_picks)
+        s.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS picks_user_week_team_idx ON picks ("user", week, team);'))
+        # One row per user per week, which the scoreboard upserts depend on. Older tables
+        # may hold repeated (user, week) rows, so fold those into their sum before indexing.
+        duplicates = [
+            dict(user=row.user, week=row.week, wins=row.wins)
+            for row in s.execute(text('SELECT "user", week, SUM(wins) AS wins FROM scoreboard GROUP BY "user", week HAVING COUNT(*) > 1;'))
+        ]
+        if duplicates:
+            s.execute(text('DELETE FROM scoreboard WHERE "user" = :user AND week = :week;'), [dict(user=d["user"], week=d["week"]) for d in duplicates])
+            s.execute(text('INSERT INTO scoreboard ("user", week, wins) VALUES (:user, :week, :wins);'), duplicates)
+        s.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS scoreboard_user_week_idx ON scoreboard ("user", week);'))
+
+def compact_dtypes(df):
+    """Stores user/team as categoricals and week/wins as the smallest integer type."""
+    for col in ("user", "team"):
+        if col in df:
+            df[col] = df[col].astype("category")
+    for col in ("week", "wins"):
+        if col in df:
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_week_picks(week):
+    """Loads every user's picks for a given week from the database."""
+    conn = get_db()
+    return compact_dtypes(conn.query('SELECT "user", team FROM picks WHERE week = :week;', params={"week": week}, ttl=0))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_user_picks(user, week):
+    """Loads the set of teams a single user has saved for a given week."""
+    conn = get_db()
+    picks_df = conn.query('SELECT team FROM picks WHERE "user" = :user AND week = :week;', params={"user": user, "week": week}, ttl=0)
+    return frozenset(picks_df['team'])
+
+def clear_picks_cache():
+    """Drops the cached pick reads after a pick is saved or cleared."""
+    load_user_picks.clear()
+    load_week_picks.clear()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_user_status():
+    """Loads the user -> status emoji map from the database."""
+    conn = get_db()
+    status_df = conn.query('SELECT "user", emoji FROM user_status;', ttl=0)
+    return dict(zip(status_df['user'], status_df['emoji']))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_scoreboard():
+    """Loads the full scoreboard table from the database."""
+    conn = get_db()
+    return compact_dtypes(conn.query('SELECT "user", week, wins FROM scoreboard;', ttl=0))
 
 # --- Scoreboard Logic (with SQL Database) ---
 
 def update_scoreboard(week, year):
     """Calculates scores for a week and updates the database."""
-    conn = st.connection("db", type="sql")
+    conn = get_db()
     with st.spinner(f"Preparing the feast and calculating scores for Week {week}..."):
         winning_teams = fetch_game_results(year, week)
         if not winning_teams:
             st.warning(f"No completed game results found for Week {week}.")
             return
 
-        all_picks_df = conn.query(f"SELECT * FROM picks WHERE week = {week};")
-        if all_picks_df.empty:
+        with conn.session as s:
+            scores = dict(s.execute(WEEK_SCORES_SQL, {"week": week, "winners": list(winning_teams)}).all())
+        if not scores:
             st.warning(f"No user picks found for Week {week}.")
             return
 
-        scores = {user: sum(1 for team in all_picks_df[all_picks_df["user"] == user]["team"] if team in winning_teams) for user in all_picks_df["user"].unique()}
+        scoreboard_df = load_scoreboard()
+        saved_week_df = scoreboard_df[scoreboard_df["week"] == week]
+        if dict(zip(saved_week_df["user"], saved_week_df["wins"])) == scores:
+            st.info(f"The table is already set! Week {week} scores haven't changed.")
+            return
 
-        with conn.session as s:
-            s.execute(text(f"DELETE FROM scoreboard WHERE week = {week};"))
-            for user, wins in scores.items():
-                s.execute(text('INSERT INTO scoreboard ("user", week, wins) VALUES (:user, :week, :wins);'), params=dict(user=user, week=week, wins=wins))
-            s.commit()
+        with conn.session as s, s.begin():
+            # Drop rows for anyone who no longer has picks this week, then upsert the rest
+            s.execute(
+                text('DELETE FROM scoreboard WHERE week = :week AND "user" NOT IN :users;').bindparams(bindparam("users", expanding=True)),
+                params={"week": week, "users": list(scores)},
+            )
+            s.execute(SCOREBOARD_UPSERT_SQL, [dict(user=user, week=week, wins=int(wins)) for user, wins in scores.items()])
         st.success(f"The table is set! Scoreboard updated for Week {week}!")
-        st.cache_data.clear()
-        st.cache_resource.clear()
+        clear_scoreboard_cache()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_standings():
+    """Builds the user x week wins table with a Total Wins column, sorted by total."""
+    df = load_scoreboard()
+    if df.empty:
+        return pd.DataFrame()
+
+    # The unique (user, week) index means each cell is a single row, so no aggregation is needed
+    pivot_df = df.pivot(index='user', columns='week', values='wins').fillna(0).astype(int)
+    pivot_df.index = pivot_df.index.astype(str)
+    pivot_df['Total Wins'] = pivot_df.sum(axis=1)
+    return pivot_df.sort_values(by='Total Wins', ascending=False)
+
+def clear_scoreboard_cache():
+    """Drops the cached scoreboard and standings after a scoreboard write."""
+    load_scoreboard.clear()
+    load_standings.clear()
 
 def display_scoreboard():
     """Loads scoreboard data and displays a leaderboard and a styled table."""
     try:
-        conn = st.connection("db", type="sql")
-
-        with conn.session as s:
-            s.execute(text('CREATE TABLE IF NOT EXISTS user_status ("user" TEXT PRIMARY KEY, emoji TEXT);'))
-            s.commit()
+        emoji_map = load_user_status()
 
-        status_df = conn.query("SELECT * FROM user_status;")
-        emoji_map = {row['user']: row['emoji'] for _, row in status_df.iterrows()} if not status_df.empty else {}
-
-        df = conn.query("SELECT * FROM scoreboard;")
-        if df.empty:
+        pivot_df = load_standings()
+        if pivot_df.empty:
             st.info("Scoreboard is empty. Submit picks to put meat on the table.")
             return
 
-        pivot_df = df.pivot_table(index='user', columns='week', values='wins', aggfunc='sum').fillna(0)
-
-        week_cols = sorted([col for col in pivot_df.columns if isinstance(col, (int, float))])
-        pivot_df['Total Wins'] = pivot_df[week_cols].sum(axis=1)
-        pivot_df.sort_values(by='Total Wins', ascending=False, inplace=True)
+        week_cols = [col for col in pivot_df.columns if col != 'Total Wins']
 
         st.header("🏆 The Head Table (Podium)")
         top_users_df = pivot_df.head(3)
@@ -286,9 +451,6 @@ def display_scoreboard():
         final_week_cols = [f"Week {col}" for col in week_cols]
         display_cols = ['Image', 'User'] + final_week_cols + ['Total Wins']
         display_df = pivot_df[display_cols]
-        
-        for col in final_week_cols + ['Total Wins']:
-            display_df[col] = display_df[col].astype(int)
 
         # Changed colormap to Autumn colors
         styled_df = display_df.style.background_gradient(
@@ -320,7 +482,8 @@ def display_login_form():
         password = st.text_input("Password", type="password", key="login_password")
         submitted = st.form_submit_button("Join the Feast")
         if submitted:
-            if username in USERS and USERS[username] == password:
+            password_hash = hashlib.sha256(password.encode()).digest()
+            if hmac.compare_digest(USER_PASSWORD_HASHES.get(username, b""), password_hash):
                 st.session_state.logged_in = True
                 st.session_state.username = username
                 st.rerun()
@@ -331,11 +494,15 @@ def display_login_form():
 
 def main_app():
     """The main application interface shown after a successful login."""
+    # --- FIX: Use the constant SEASON_YEAR instead of current system year ---
+    current_year = SEASON_YEAR
+    this_week = get_current_week()
+
     with st.sidebar:
         st.header(f"🍂 Welcome, {st.session_state.username}!")
         st.write("Your Drafted Turkeys (Teams):")
         my_teams_df = pd.DataFrame(st.session_state.my_teams, columns=["Team"])
-        st.dataframe(my_teams_df, hide_index=True, use_container_width=True)
+        st.table(my_teams_df, hide_index=True)
         st.divider()
         if st.button("Leave the Table (Logout)", use_container_width=True):
             st.session_state.clear()
@@ -346,56 +513,29 @@ def main_app():
     with tab1:
         st.title("🦃 Weekly Picks Selection")
         
-        # --- FIX: Use the constant SEASON_YEAR instead of current system year ---
-        current_year = SEASON_YEAR 
-        
         current_week = int(st.selectbox(
             "Select Week",
             options=[f"Week {i}" for i in range(1, 16)],
-            index=get_current_week() - 1,
+            index=this_week - 1,
             key="week_selector_tab1"
         ).split(" ")[1])
 
         with st.spinner(f"Plucking feathers for Week {current_week}..."):
             betting_data = fetch_betting_lines(current_year, current_week)
             completed_scores = fetch_completed_game_scores(current_year, current_week)
-            conn = st.connection("db", type="sql")
-            existing_picks_df = conn.query('SELECT team FROM picks WHERE "user" = :user AND week = :week;', params={"user": st.session_state.username, "week": current_week})
-            existing_picks = set(existing_picks_df['team'])
+            existing_picks = load_user_picks(st.session_state.username, current_week)
+            schedule_file = find_schedule_file(current_year, current_week)
+            matchups_df = load_schedule(schedule_file, get_file_mtime(schedule_file))
 
-            game_info = {}
-            try:
-                # Ensure the CSV filename uses the correct year if you have local files
-                schedule_df = pd.read_csv(f"{current_year}_week_{current_week}.csv")
-                for _, row in schedule_df.iterrows():
-                    game_info[row['homeTeam']] = {'opponent': row['awayTeam'], 'location': 'Home'}
-                    game_info[row['awayTeam']] = {'opponent': row['homeTeam'], 'location': 'Away'}
-            except FileNotFoundError:
-                # Warn, but don't crash if CSV is missing; API data might still load
-                pass 
-
-        picks_data = []
-        for team in st.session_state.my_teams:
-            match_details = game_info.get(team, {})
-            line = betting_data.get(team, {}).get('spread')
-
-            result_str = "Pending"
-            if team in completed_scores:
-                game_result = completed_scores[team]
-                result_char = "W" if game_result['win'] else "L"
-                result_str = f"{result_char} ({game_result['score']}-{game_result['opponent_score']})"
-
-            picks_data.append({
-                "Select": team in existing_picks,
-                "My Team": team,
-                "Location": match_details.get('location', 'N/A'),
-                "Opponent": match_details.get('opponent', 'BYE WEEK'),
-                "Line": f"+{line}" if line and line > 0 else str(line) if line is not None else "N/A",
-                "Result": result_str
-            })
+        # One join against the schedule instead of a lookup per drafted team
+        picks_df = pd.DataFrame({"My Team": pd.Series(st.session_state.my_teams, dtype=object)}).join(matchups_df, on="My Team")
+        picks_df = picks_df.fillna({"Location": "N/A", "Opponent": "BYE WEEK"})
+        picks_df["Select"] = picks_df["My Team"].isin(existing_picks)
+        picks_df["Line"] = [format_spread(betting_data.get(team, {}).get('spread')) for team in picks_df["My Team"]]
+        picks_df["Result"] = [format_game_result(completed_scores.get(team)) for team in picks_df["My Team"]]
 
         cols_order = ['Select', 'My Team', 'Location', 'Opponent', 'Line', 'Result']
-        picks_df = pd.DataFrame(picks_data)[cols_order] if picks_data else pd.DataFrame(columns=cols_order)
+        picks_df = picks_df[cols_order]
         picks_are_locked = are_picks_locked(current_week, current_year)
 
         if picks_are_locked:
@@ -410,23 +550,23 @@ def main_app():
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("✅ Serve Picks", use_container_width=True, type="primary"):
-                        with st.connection("db", type="sql").session as s:
-                            s.execute(text('DELETE FROM picks WHERE "user" = :user AND week = :week;'), params={"user": st.session_state.username, "week": current_week})
-                            for team in selected_teams:
-                                s.execute(text('INSERT INTO picks ("user", week, team) VALUES (:user, :week, :team);'), params={"user": st.session_state.username, "week": current_week, "team": team})
-                            s.commit()
+                        # Only write the difference from what's already saved for this week
+                        dropped_teams = existing_picks.difference(selected_teams)
+                        added_teams = [team for team in selected_teams if team not in existing_picks]
+                        with get_db().session as s, s.begin():
+                            if dropped_teams:
+                                s.execute(text('DELETE FROM picks WHERE "user" = :user AND week = :week AND team = :team;'), [{"user": st.session_state.username, "week": current_week, "team": team} for team in dropped_teams])
+                            if added_teams:
+                                s.execute(text('INSERT INTO picks ("user", week, team) VALUES (:user, :week, :team) ON CONFLICT ("user", week, team) DO NOTHING;'), [{"user": st.session_state.username, "week": current_week, "team": team} for team in added_teams])
                         st.success("Gobble gobble! Picks served successfully!")
-                        st.cache_data.clear()
-                        st.cache_resource.clear()
+                        clear_picks_cache()
                         st.rerun()
                 with col2:
                     if st.button("❌ Toss Leftovers (Clear)", use_container_width=True):
-                        with st.connection("db", type="sql").session as s:
+                        with get_db().session as s, s.begin():
                             s.execute(text('DELETE FROM picks WHERE "user" = :user AND week = :week;'), params={"user": st.session_state.username, "week": current_week})
-                            s.commit()
                         st.success("Plate cleared!")
-                        st.cache_data.clear()
-                        st.cache_resource.clear()
+                        clear_picks_cache()
                         st.rerun()
 
     with tab2:
@@ -462,12 +602,12 @@ def main_app():
                     
                     if st.form_submit_button("Update Status"):
                         try:
-                            with st.connection("db", type="sql").session as s:
+                            with get_db().session as s, s.begin():
                                 s.execute(text('DELETE FROM user_status WHERE "user" = :user;'), params={"user": user_to_edit})
                                 if emoji_to_store != "None":
                                     s.execute(text('INSERT INTO user_status ("user", emoji) VALUES (:user, :emoji);'), params={"user": user_to_edit, "emoji": emoji_to_store})
-                                s.commit()
                             st.success(f"Status for {user_to_edit} has been garnished.")
+                            load_user_status.clear()
                             st.rerun()
                         except Exception as e: st.error(f"Database error: {e}")
 
@@ -479,34 +619,29 @@ def main_app():
                 manual_wins = st.number_input("Enter Total Wins", min_value=0, step=1)
                 if st.form_submit_button("Submit Manual Score"):
                     try:
-                        with st.connection("db", type="sql").session as s:
-                            s.execute(text('DELETE FROM scoreboard WHERE "user" = :user AND week = :week;'), params={"user": manual_user, "week": manual_week})
-                            s.execute(text('INSERT INTO scoreboard ("user", week, wins) VALUES (:user, :week, :wins);'), params={"user": manual_user, "week": manual_week, "wins": manual_wins})
-                            s.commit()
+                        with get_db().session as s, s.begin():
+                            s.execute(SCOREBOARD_UPSERT_SQL, params={"user": manual_user, "week": manual_week, "wins": manual_wins})
+                        clear_scoreboard_cache()
                         st.success(f"Updated Week {manual_week} score for {manual_user}.")
                         st.rerun()
                     except Exception as e: st.error(f"Failed to update database: {e}")
 
             st.subheader("Update Weekly Scores (Automatic)")
-            max_week = get_current_week()
+            max_week = this_week
             updatable_weeks = range(1, max_week + 1)
             if not updatable_weeks:
                 st.info("No weeks are available to update yet.")
             else:
                 week_to_update = st.selectbox("Select week to update scores", options=updatable_weeks, index=len(updatable_weeks) - 1)
                 
-                # --- FIX: Pass SEASON_YEAR here ---
                 if st.button(f"Cook Scores for Week {week_to_update}", type="primary"):
-                    update_scoreboard(week_to_update, SEASON_YEAR)
+                    update_scoreboard(week_to_update, current_year)
 
         st.divider()
 
         st.header("🕵️‍♂️ Post-Game Digest (Review)")
         
-        # --- FIX: Use SEASON_YEAR instead of current system year ---
-        current_year = SEASON_YEAR
-        
-        last_completed_week = get_current_week() - 1
+        last_completed_week = this_week - 1
 
         if last_completed_week < 1:
             st.info("No weeks have been completed yet.")
@@ -515,51 +650,41 @@ def main_app():
             review_week = st.selectbox("Select a week to review", options=reviewable_weeks, index=len(reviewable_weeks) - 1, format_func=lambda w: f"Week {w}")
 
             with st.spinner(f"Reviewing the game tape for Week {review_week}..."):
-                conn = st.connection("db", type="sql")
-                all_weekly_picks_df = conn.query(f"SELECT * FROM picks WHERE week = {review_week};")
+                all_weekly_picks_df = load_week_picks(review_week)
                 betting_data = fetch_betting_lines(current_year, review_week)
                 game_results = fetch_completed_game_scores(current_year, review_week)
 
             if all_weekly_picks_df.empty:
                 st.warning(f"No one submitted picks for Week {review_week}. Fasting week?")
             else:
-                picks_by_user = all_weekly_picks_df.groupby('user')
                 moneyline_odds = {team: data['moneyline'] for team, data in betting_data.items() if 'moneyline' in data}
-
-                for user, user_picks_df in picks_by_user:
+                winning_teams = [team for team, result in game_results.items() if result['win']]
+
+                # Grade every pick for the week in one pass, then slice per user below
+                review_df = all_weekly_picks_df[['user']].copy()
+                review_df['Pick'] = all_weekly_picks_df['team'].astype(str)
+                spread_list = [betting_data.get(team, {}).get('spread') for team in review_df['Pick']]
+                spreads = pd.Series(spread_list, index=review_df.index, dtype=float)
+                review_df['is_correct'] = review_df['Pick'].isin(winning_teams)
+                review_df['is_favorite'] = spreads.lt(0)
+                review_df['is_upset'] = spreads.gt(0)
+                review_df['Spread'] = [format_spread(spread) for spread in spread_list]
+                review_df['Type'] = np.select([review_df['is_favorite'], review_df['is_upset']], ["Favorite", "Upset Pick"], "Even Match")
+                review_df['Outcome'] = np.select([review_df['is_correct'], review_df['Pick'].isin(list(game_results))], ["✅ Win", "❌ Loss"], "Pending")
+
+                for user, user_review_df in review_df.groupby('user', observed=True):
                     with st.expander(f"**{user}'s Plate for Week {review_week}**"):
-                        total_picks = len(user_picks_df)
-                        correct_picks, upset_wins, favorite_losses = 0, 0, 0
-                        review_data, picked_teams_list = [], []
+                        total_picks = len(user_review_df)
+                        correct_picks = int(user_review_df['is_correct'].sum())
+                        upset_wins = int((user_review_df['is_correct'] & user_review_df['is_upset']).sum())
+                        favorite_losses = int((~user_review_df['is_correct'] & user_review_df['is_favorite']).sum())
 
                         # --- UPDATED THEMED COMMENTARY ---
                         if user == "Jared":
-                            is_chalk_eater, is_fish_bettor = False, False
-                            for _, pick_row in user_picks_df.iterrows():
-                                spread = betting_data.get(pick_row['team'], {}).get('spread')
-                                if spread is not None:
-                                    if spread < 0: is_chalk_eater = True
-                                    elif spread > 0: is_fish_bettor = True
-                            if is_fish_bettor: st.warning("🐠 **Fish Bet!** Swimming upstream... or maybe just drowning in gravy.")
-                            if is_chalk_eater: st.info("🥖 **Stale Roll!** Playing it safe with the favorites.")
-
-                        for _, pick_row in user_picks_df.iterrows():
-                            team = pick_row['team']
-                            picked_teams_list.append(team)
-                            is_correct = game_results.get(team, {}).get('win', False)
-                            spread = betting_data.get(team, {}).get('spread')
-
-                            if is_correct: correct_picks += 1
-                            if is_correct and spread is not None and spread > 0: upset_wins += 1
-                            if not is_correct and spread is not None and spread < 0: favorite_losses += 1
-
-                            spread_str = f"+{spread}" if spread and spread > 0 else str(spread) if spread is not None else "N/A"
-                            pick_type = "Favorite" if spread is not None and spread < 0 else "Upset Pick" if spread is not None and spread > 0 else "Even Match"
-                            outcome_str = "✅ Win" if is_correct else "❌ Loss" if team in game_results else "Pending"
-
-                            review_data.append({"Pick": team, "Spread": spread_str, "Type": pick_type, "Outcome": outcome_str})
-
-                        parlay_str = calculate_parlay_odds(picked_teams_list, moneyline_odds)
+                            if user_review_df['is_upset'].any(): st.warning("🐠 **Fish Bet!** Swimming upstream... or maybe just drowning in gravy.")
+                            if user_review_df['is_favorite'].any(): st.info("🥖 **Stale Roll!** Playing it safe with the favorites.")
+
+                        parlay_str = calculate_parlay_odds(user_review_df['Pick'].tolist(), moneyline_odds)
                         st.markdown(f"##### Grade: **{correct_picks}/{total_picks}** | Hypothetical Cornucopia: **{parlay_str}**")
 
                         if correct_picks == total_picks and total_picks > 0: st.success("🦃 **The Golden Turkey!** A perfect week! You get the wishbone and the drumstick.")
@@ -567,16 +692,16 @@ def main_app():
                         if favorite_losses > 0: st.warning(f"🍞 **Burnt Stuffing!** You choked on **{favorite_losses} supposed 'sure thing'(s)**.")
                         if correct_picks == 0 and total_picks > 0: st.error("😴 **Tryptophan Coma!** You picked all losers. Time for a nap.")
 
-                        st.dataframe(pd.DataFrame(review_data), hide_index=True, use_container_width=True)
+                        st.table(user_review_df[['Pick', 'Spread', 'Type', 'Outcome']], hide_index=True)
 
 # --- App Initialization and State Management ---
-if 'logged_in' not in st.session_state:
-    st.session_state.logged_in = False
+st.session_state.setdefault('logged_in', False)
 
 # --- Main Render Logic ---
 if st.session_state.logged_in:
+    init_db()
     if 'my_teams' not in st.session_state:
-        all_picks = parse_draft_summary()
+        all_picks = parse_draft_summary(file_mtime=get_file_mtime(DRAFT_SUMMARY_FILE))
         st.session_state.my_teams = all_picks.get(st.session_state.username, [])
     main_app()
 else: